@@ -2,15 +2,19 @@
 ChainMind AI Demand Forecasting Microservice
 =============================================
 Flask application factory with Blueprint registration,
-central error handling, and auto-training on first start.
+central error handling, eager model loading, and auto-training on
+first start.
 """
 
 import os
 import logging
 from flask import Flask, jsonify
 
-from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG, MODEL_PATH
+from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG, MODEL_PATH, PROFILE_DIR
 from routes.predict import predict_bp
+from services.predictor import reload_model
+from utils.feature_engineering import warm_up
+from utils.json_provider import OrjsonProvider
 
 # ── Logging ──────────────────────────────────────────────────────
 logging.basicConfig(
@@ -23,10 +27,29 @@ logger = logging.getLogger(__name__)
 def create_app() -> Flask:
     """Application factory."""
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
 
     # Register blueprints
     app.register_blueprint(predict_bp)
 
+    # Load the model once per process so requests never touch the disk,
+    # and the feature kernel so the first request doesn't pay for the JIT
+    reload_model()
+    warm_up()
+
+    # Per-request cProfile dumps (inspect with snakeviz / pstats)
+    if FLASK_DEBUG and PROFILE_DIR:
+        from werkzeug.middleware.profiler import ProfilerMiddleware
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        app.wsgi_app = ProfilerMiddleware(
+            app.wsgi_app,
+            stream=None,
+            restrictions=[30],
+            profile_dir=PROFILE_DIR,
+            filename_format="{method}-{path}-{time:.0f}-{elapsed:.0f}ms.prof",
+        )
+        logger.info("Request profiling enabled → %s", PROFILE_DIR)
+
     # ── Central JSON error handlers ──────────────────────────────
     @app.errorhandler(400)
     def bad_request(e):
@@ -43,7 +66,7 @@ def create_app() -> Flask:
     return app
 
 
-def _ensure_model():
+def ensure_model():
     """Train a model on synthetic data if none exists yet."""
     if os.path.exists(MODEL_PATH):
         logger.info("Existing model found at %s — skipping initial training", MODEL_PATH)
@@ -57,9 +80,9 @@ def _ensure_model():
     )
 
 
-# ── Entry-point ──────────────────────────────────────────────────
+# ── Development entry-point (production: gunicorn -c gunicorn_conf.py wsgi:app)
 if __name__ == "__main__":
-    _ensure_model()
+    ensure_model()
     app = create_app()
     logger.info("Starting AI service on %s:%s", FLASK_HOST, FLASK_PORT)
     app.run(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG)
@@ -9,16 +9,22 @@ import os
 FLASK_HOST = os.getenv("FLASK_HOST", "0.0.0.0")
 FLASK_PORT = int(os.getenv("FLASK_PORT", 5001))
 FLASK_DEBUG = os.getenv("FLASK_DEBUG", "true").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR")   # Debug only: write a cProfile dump per request here
 
 # ── Model Persistence ───────────────────────────────────────────
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-MODEL_PATH = os.path.join(MODEL_DIR, "demand_model.pkl")
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(os.path.dirname(__file__), "models"))  # e.g. /dev/shm/chainmind
+MODEL_PATH = os.path.join(MODEL_DIR, "demand_model.ubj")          # XGBoost native booster
+MODEL_META_PATH = os.path.join(MODEL_DIR, "demand_model.json")    # feature_names sidecar
+MODEL_LIB_PATH = os.path.join(MODEL_DIR, "demand_model.so")       # Treelite-compiled predictor (optional)
+COMPILE_MODEL = os.getenv("COMPILE_MODEL", "true").lower() == "true"  # Build MODEL_LIB_PATH after training (adds tens of seconds)
 
 # ── Feature Engineering ─────────────────────────────────────────
 ROLLING_WINDOWS = [7, 14]          # Days for rolling mean / std
 MIN_HISTORY_LEN = 14               # Minimum sales history length
 
 # ── XGBoost Hyper-parameters ────────────────────────────────────
+XGB_DEVICE = os.getenv("XGB_DEVICE")  # Training device, e.g. cpu / cuda:0 (unset = CUDA if CuPy sees a GPU)
+
 XGB_PARAMS = {
     "n_estimators": 300,
     "max_depth": 6,
@@ -27,11 +33,27 @@ XGB_PARAMS = {
     "colsample_bytree": 0.8,
     "random_state": 42,
     "objective": "reg:squarederror",
+    "tree_method": "hist",
 }
 
+# ── Inference micro-batching ────────────────────────────────────
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", 0))  # Extra wait once rows are queued (0 = drain only)
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", 64))               # Rows per model call
+
+# ── Prediction result cache ─────────────────────────────────────
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", 10_000))  # Entries per worker
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", 60))      # Seconds
+
+# ── Background retraining ───────────────────────────────────────
+RETRAIN_TASK_HISTORY = 50          # Finished retrain tasks kept for /retrain/status
+RETRAIN_TASKS_PATH = os.path.join(MODEL_DIR, "retrain_tasks.json")  # Task records shared by all workers
+RETRAIN_LOCK_PATH = os.path.join(MODEL_DIR, "retrain.lock")         # Held while a retrain is training
+
 # ── Synthetic Data ──────────────────────────────────────────────
 SYNTHETIC_SAMPLES = 2000           # Rows for training data generation
 SYNTHETIC_HISTORY_LEN = 60         # Days per sample
+SYNTHETIC_CHUNK_SIZE = 4096        # Samples per generator task (each gets its own RNG stream)
+SYNTHETIC_N_JOBS = int(os.getenv("SYNTHETIC_N_JOBS", -1))  # Generator threads (-1 = all cores)
 
 # ── Historical data (seeded from server) ────────────────────────
 SALES_HISTORY_JSON = os.getenv(
@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for the ChainMind AI service.
+
+    gunicorn -c gunicorn_conf.py wsgi:app
+
+The app (and model) is loaded once in the master and forked into the
+workers, so the booster pages are shared copy-on-write. Inference is
+short and CPU-bound and retraining runs on a background thread, so the
+default worker class is `gthread`; set GUNICORN_WORKER_CLASS=gevent for
+connection-heavy deployments (requires `pip install gevent`).
+
+A successful /retrain sends SIGHUP to the master itself; to pick up a
+model trained elsewhere (e.g. `python -m services.trainer`):
+
+  kill -HUP <master pid>   reloads the model in the master, then rotates
+                           all workers onto it (pages shared again)
+  kill -HUP <worker pid>   reloads the model in place in that worker
+                           (on its next prediction)
+
+Point MODEL_DIR at tmpfs (e.g. /dev/shm/chainmind) so reloads read
+from memory.
+"""
+
+import multiprocessing
+import os
+import signal
+
+from config import FLASK_HOST, FLASK_PORT
+
+bind = f"{FLASK_HOST}:{FLASK_PORT}"
+
+workers = int(os.getenv("GUNICORN_WORKERS", 2 * multiprocessing.cpu_count() + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 4))              # gthread only
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))  # gevent only
+
+preload_app = True
+timeout = 60
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+# ── Server hooks ────────────────────────────────────────────────
+def on_reload(server):
+    """Master got SIGHUP: refresh the preloaded model before new workers fork."""
+    from services.predictor import reload_model
+    reload_model()
+
+
+def post_worker_init(worker):
+    """Worker SIGHUP → reload the model in place (by default it would kill the worker)."""
+    from services.predictor import request_reload
+    from services.retrain_jobs import set_master_pid
+
+    set_master_pid(worker.ppid)   # retrains in this worker publish via the master
+
+    def _reload(signum, frame):
+        # Only flag it: the handler may interrupt a request holding the
+        # predictor's cache lock (sync / gevent workers run requests here)
+        worker.log.info("SIGHUP — reloading model in worker %s", worker.pid)
+        request_reload()
+
+    signal.signal(signal.SIGHUP, _reload)
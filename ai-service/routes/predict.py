@@ -1,13 +1,13 @@
 """
-Flask Blueprint — /predict-demand  &  /health  &  /retrain
+Flask Blueprint — /predict-demand  &  /health  &  /retrain  &  /retrain/status
 """
 
 import logging
 import time
 from flask import Blueprint, request, jsonify
 
-from services.predictor import predict, reload_model
-from services.trainer import retrain
+from services.predictor import predict
+from services.retrain_jobs import submit_retrain, get_task
 
 logger = logging.getLogger(__name__)
 
@@ -72,17 +72,28 @@ def health():
 @predict_bp.route("/retrain", methods=["POST"])
 def trigger_retrain():
     """
-    Kick off a synchronous retrain.  In production this would be
-    dispatched to a background worker / celery task.
+    Queue a retrain on the background worker and return 202 immediately.
+    Poll /retrain/status/<taskId> for the outcome; the new model is
+    swapped in automatically once training succeeds.
     """
     try:
-        metrics = retrain()
-        reload_model()   # swap in the freshly trained model
-        return jsonify({
-            "success": True,
-            "message": "Model retrained successfully",
-            "metrics": metrics,
-        }), 200
+        task = submit_retrain()
     except Exception as exc:
-        logger.exception("Retrain failed")
+        logger.exception("Could not queue retrain")
         return jsonify({"success": False, "error": str(exc)}), 500
+
+    return jsonify({
+        "success": True,
+        "message": "Model retrain queued",
+        **task,
+    }), 202
+
+
+# ── GET /retrain/status/<taskId> ────────────────────────────────
+@predict_bp.route("/retrain/status/<task_id>", methods=["GET"])
+def retrain_status(task_id: str):
+    """Report the state of a retrain task queued via POST /retrain."""
+    task = get_task(task_id)
+    if task is None:
+        return jsonify({"success": False, "error": "Unknown retrain task"}), 404
+    return jsonify({"success": True, **task}), 200
@@ -8,51 +8,230 @@ Public API
       Returns:  { predictedDailyDemand, daysToStockout, suggestedReorderQty,
                   confidence }
 
-The service falls back to a simple moving-average heuristic when the
-XGBoost model file is missing — this keeps the endpoint available even
-before the first training run.
+The model is loaded once at startup (`reload_model()` from the app
+factory); the request path only reads the cache. The service falls back
+to a simple moving-average heuristic when no model file was found —
+this keeps the endpoint available even before the first training run.
+
+Results are memoised in a per-process TTL/LRU cache keyed by the full
+request inputs (and the day), so dashboards polling the same products
+skip inference entirely; the cache is cleared whenever the model is
+reloaded. Concurrent cache misses are coalesced by a micro-batcher: each request
+queues its feature row and a background thread runs one model call per batch,
+which amortises the per-call overhead. That call goes to the Treelite-compiled
+shared library when the trainer produced one (and tl2cgen is installed),
+otherwise to `booster.inplace_predict`.
 """
 
 import os
+import json
 import logging
 import math
 import datetime
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
 import numpy as np
-import joblib
+import xgboost as xgb
+from cachetools import TTLCache
 
-from config import MODEL_PATH, SAFETY_FACTOR, MIN_HISTORY_LEN
-from utils.feature_engineering import extract_features
+from config import (
+    MODEL_PATH,
+    MODEL_META_PATH,
+    MODEL_LIB_PATH,
+    SAFETY_FACTOR,
+    MIN_HISTORY_LEN,
+    PREDICT_BATCH_WINDOW_MS,
+    PREDICT_BATCH_MAX,
+    PREDICT_CACHE_SIZE,
+    PREDICT_CACHE_TTL,
+)
+from utils.feature_engineering import FEATURE_NAMES, extract_features_vec
 
 logger = logging.getLogger(__name__)
 
+_N_FEATURES = len(FEATURE_NAMES)
+_MEAN_7 = FEATURE_NAMES.index("rolling_mean_7")
+_STD_7 = FEATURE_NAMES.index("rolling_std_7")
+
 # ── Module-level model cache ────────────────────────────────────
 _model_cache: dict | None = None
+_reload_pending = False    # set from signal handlers, see request_reload()
+
+# ── Prediction result cache (cleared on every reload) ───────────
+_pred_cache: TTLCache = TTLCache(maxsize=PREDICT_CACHE_SIZE, ttl=PREDICT_CACHE_TTL)
+_pred_cache_lock = threading.Lock()
+
+# ── Per-thread feature scratch buffer ───────────────────────────
+_tls = threading.local()
+
+
+def _feature_buffer() -> np.ndarray:
+    """This thread's reusable feature row (requests never share a thread)."""
+    buf = getattr(_tls, "buf", None)
+    if buf is None:
+        buf = _tls.buf = np.empty(_N_FEATURES, dtype=np.float32)   # the model's input dtype
+    return buf
+
+
+def _load_compiled(path: str):
+    """
+    Load the Treelite-compiled model as a `predict(X) → ndarray` callable,
+    or None when it is missing or tl2cgen is unavailable.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        import tl2cgen
+    except ImportError:
+        logger.info("tl2cgen not installed — ignoring compiled model at %s", path)
+        return None
+
+    # dlopen() caches by path, so a reload after retraining would hand back
+    # the old library — load from a private copy instead
+    fd, private = tempfile.mkstemp(suffix=".so")
+    os.close(fd)
+    try:
+        shutil.copyfile(path, private)
+        lib = tl2cgen.Predictor(private, nthread=1)
+    except Exception:
+        logger.exception("Could not load compiled model at %s — using the booster", path)
+        return None
+    finally:
+        os.remove(private)   # the mapping outlives the file
+
+    def predict_fn(X: np.ndarray) -> np.ndarray:
+        return lib.predict(tl2cgen.DMatrix(X)).ravel()
+
+    logger.info("Using compiled model from %s", path)
+    return predict_fn
 
 
 def _load_model() -> dict | None:
-    """Load and cache the persisted model artifact."""
-    global _model_cache
-    if _model_cache is not None:
-        return _model_cache
-    if os.path.exists(MODEL_PATH):
-        logger.info("Loading model from %s", MODEL_PATH)
-        _model_cache = joblib.load(MODEL_PATH)
-        return _model_cache
-    logger.warning("Model file not found at %s — falling back to heuristic", MODEL_PATH)
-    return None
+    """Read the persisted model artifact, or None if it does not exist."""
+    if not os.path.exists(MODEL_PATH):
+        logger.warning("Model file not found at %s — falling back to heuristic", MODEL_PATH)
+        return None
+    logger.info("Loading model from %s", MODEL_PATH)
+    booster = xgb.Booster()
+    booster.load_model(MODEL_PATH)
+    with open(MODEL_META_PATH) as f:
+        feature_names = json.load(f)["feature_names"]
+    # Inference writes features in FEATURE_NAMES order — check once here
+    if tuple(feature_names) != FEATURE_NAMES:
+        raise ValueError(
+            f"Model at {MODEL_PATH} was trained on a different feature schema "
+            f"({feature_names}) — retrain it"
+        )
+    predict_fn = _load_compiled(MODEL_LIB_PATH) or booster.inplace_predict
+    return {"booster": booster, "feature_names": feature_names, "predict_fn": predict_fn}
 
 
 def reload_model() -> bool:
-    """Force-reload after retraining. Returns True if model loaded."""
+    """
+    (Re)load the model into the cache — called once by the app factory
+    and again after retraining. Returns True if model loaded.
+    """
     global _model_cache
-    _model_cache = None
-    return _load_model() is not None
+    _model_cache = _load_model()   # swap before clearing — see the store in predict()
+    with _pred_cache_lock:
+        _pred_cache.clear()
+    return _model_cache is not None
+
+
+def request_reload() -> None:
+    """
+    Reload the model at the start of the next prediction. Safe to call
+    from a signal handler, which may interrupt a thread holding the
+    cache lock that reload_model() needs.
+    """
+    global _reload_pending
+    _reload_pending = True
+
+
+class _PredictBatcher:
+    """
+    Coalesces single-row predictions arriving within a short window
+    into one model call and fans the results back out.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self._window = window_ms / 1000.0
+        self._max_batch = max(1, max_batch)
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, predict_fn, x: np.ndarray) -> float:
+        """Queue one feature row and block until its prediction is ready."""
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((predict_fn, x, fut))
+        return fut.result()
+
+    def _ensure_worker(self) -> None:
+        # Started lazily so every forked worker process gets its own thread
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="predict-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Take what is already queued; only hold the batch open for the
+            # window when other requests are in flight — a lone request never waits
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                timeout = deadline - time.monotonic()
+                if len(batch) == 1 or timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    @staticmethod
+    def _flush(batch: list) -> None:
+        # A reload can swap the model mid-batch — run one call per model
+        by_model: dict[int, list] = {}
+        for item in batch:
+            by_model.setdefault(id(item[0]), []).append(item)
+
+        for items in by_model.values():
+            predict_fn = items[0][0]
+            try:
+                preds = predict_fn(np.vstack([x for _, x, _ in items]))
+            except Exception as exc:
+                for _, _, fut in items:
+                    fut.set_exception(exc)
+                continue
+            for (_, _, fut), p in zip(items, preds.tolist()):
+                fut.set_result(p)
+
+
+_batcher = _PredictBatcher(PREDICT_BATCH_WINDOW_MS, PREDICT_BATCH_MAX)
 
 
 def _heuristic_predict(sales_history: list, current_stock: float, lead_time: float) -> float:
     """Simple 7-day moving-average fallback when ML model is unavailable."""
-    window = sales_history[-7:] if len(sales_history) >= 7 else sales_history
-    return float(np.mean(window)) if window else 0.0
+    window = sales_history[-7:]
+    # Plain float sum — a ≤7-element list doesn't amortise NumPy's call overhead
+    return math.fsum(map(float, window)) / len(window) if window else 0.0
 
 
 def predict(payload: dict) -> dict:
@@ -84,30 +263,44 @@ def predict(payload: dict) -> dict:
     if lead_time <= 0:
         raise ValueError("leadTimeDays must be positive")
 
+    global _reload_pending
+    if _reload_pending:
+        _reload_pending = False
+        reload_model()
+
+    today = datetime.date.today().isoformat()
+
+    # ── Result cache ─────────────────────────────────────────────
+    try:
+        cache_key = (product_id, tuple(sales_history), current_stock, lead_time, city, today)
+        hash(cache_key)
+    except TypeError:
+        cache_key = None   # unhashable payload values — just skip the cache
+
+    if cache_key is not None:
+        with _pred_cache_lock:
+            cached = _pred_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
     # ── Predict daily demand ─────────────────────────────────────
-    artifact = _load_model()
+    artifact = _model_cache
     method = "xgboost"
-    today = datetime.date.today().isoformat()
 
     if artifact is not None:
-        model = artifact["model"]
-        feature_names = artifact["feature_names"]
-
-        feats = extract_features(
+        x = extract_features_vec(
             sales_history,
             current_stock,
             lead_time,
+            _feature_buffer(),
             city=city,
             ref_date=today,
         )
-
-        # Ensure we only pass features the model expects
-        X = np.array([[feats.get(k, 0.0) for k in feature_names]])
-        predicted_demand = float(model.predict(X)[0])
+        predicted_demand = float(_batcher.submit(artifact["predict_fn"], x))
 
         # Confidence: use relative std of residuals on training data as proxy
-        rolling_std = feats.get("rolling_std_7", 1.0)
-        rolling_mean = feats.get("rolling_mean_7", 1.0)
+        rolling_std = float(x[_STD_7])
+        rolling_mean = float(x[_MEAN_7])
         cv = rolling_std / rolling_mean if rolling_mean > 0 else 1.0
         confidence = round(max(0.0, min(1.0, 1.0 - cv)), 3)
     else:
@@ -150,4 +343,10 @@ def predict(payload: dict) -> dict:
         method, confidence,
     )
 
-    return result
+    if cache_key is not None:
+        with _pred_cache_lock:
+            # Skip if a reload swapped the model mid-prediction: its cache
+            # clear may already have run, and this result is from the old one
+            if _model_cache is artifact:
+                _pred_cache[cache_key] = result
+    return dict(result)
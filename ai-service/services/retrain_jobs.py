@@ -0,0 +1,202 @@
+"""
+Background retrain jobs — keeps model training off the request thread.
+
+Public API
+──────────
+  submit_retrain() → dict
+      Queues a retrain (or returns the one already waiting) and returns
+      its task record immediately.
+  get_task(task_id: str) → dict | None
+      { taskId, status, submittedAt, startedAt?, finishedAt?, metrics?, error? }
+      status ∈ queued | running | succeeded | failed
+  set_master_pid(pid: int) → None
+      Called by gunicorn's post_worker_init: successful retrains then
+      SIGHUP the master so every worker is rotated onto the new model.
+
+Task records live in a JSON file under MODEL_DIR guarded by an `fcntl`
+lock, so any gunicorn worker can answer a status poll and a queued task
+is joined no matter which worker receives the request. Training runs on
+a background thread; a second file lock serialises it across workers,
+and its holder runs every task queued in the meantime before publishing
+the new model. Each process keeps serving predictions with the old
+model until then.
+"""
+
+import json
+import logging
+import os
+import signal
+import tempfile
+import uuid
+import datetime
+import fcntl
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import RETRAIN_TASK_HISTORY, RETRAIN_TASKS_PATH, RETRAIN_LOCK_PATH
+from services.predictor import reload_model
+from services.trainer import retrain
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrain")
+_master_pid: int | None = None
+
+_PENDING = ("queued", "running")
+
+
+def set_master_pid(pid: int) -> None:
+    """Publish successful retrains by sending SIGHUP to this (gunicorn master) pid."""
+    global _master_pid
+    _master_pid = pid
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+@contextmanager
+def _flock(path: str):
+    """Hold an exclusive `fcntl` lock on `path` (shared by every process and thread)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _process_id(pid: int) -> str | None:
+    """
+    `pid` plus its start time (Linux /proc), or None if it is not running.
+    PIDs are reused after a container restart; the start time is not.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return f"{pid}:{fields[19]}"   # field 22, starttime
+    except FileNotFoundError:
+        if os.path.isdir("/proc"):
+            return None
+    except (OSError, IndexError):
+        pass
+    try:                                   # no /proc: liveness by pid alone
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return str(pid)
+
+
+def _owner_alive(owner: str | None) -> bool:
+    return owner is not None and _process_id(int(owner.split(":")[0])) == owner
+
+
+@contextmanager
+def _store():
+    """
+    Yield the task records ({taskId: record}, oldest first) under the
+    store lock and write them back if they changed.
+    """
+    with _flock(RETRAIN_TASKS_PATH + ".lock"):
+        try:
+            with open(RETRAIN_TASKS_PATH) as f:
+                tasks = json.load(f)
+        except (FileNotFoundError, ValueError):
+            tasks = {}
+        before = json.dumps(tasks)
+
+        # A worker that exited (or was rotated out, or predates a restart
+        # that reused its pid) never finishes its tasks
+        for task in tasks.values():
+            if task["status"] in _PENDING and not _owner_alive(task.get("owner")):
+                task.update(status="failed", finishedAt=_now(),
+                            error="Worker exited before the retrain finished")
+
+        yield tasks
+
+        if json.dumps(tasks) != before:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(RETRAIN_TASKS_PATH))
+            with os.fdopen(fd, "w") as f:
+                json.dump(tasks, f)
+            os.replace(tmp_path, RETRAIN_TASKS_PATH)
+
+
+def _public(task: dict) -> dict:
+    """Task record without the owning worker's identity."""
+    return {k: v for k, v in task.items() if k != "owner"}
+
+
+def _update(task_id: str, **fields) -> None:
+    with _store() as tasks:
+        if task_id in tasks:
+            tasks[task_id].update(fields)
+
+
+def _publish_model() -> None:
+    """Swap the new model in here, then have gunicorn rotate every worker onto it."""
+    reload_model()
+    if _master_pid is not None:
+        os.kill(_master_pid, signal.SIGHUP)
+
+
+def _claim_queued() -> str | None:
+    """Mark the queued task (whichever worker queued it) as running here."""
+    with _store() as tasks:
+        for task in tasks.values():
+            if task["status"] == "queued":
+                task.update(status="running", startedAt=_now(), owner=_process_id(os.getpid()))
+                return task["taskId"]
+    return None
+
+
+def _train(task_id: str) -> bool:
+    try:
+        metrics = retrain()
+    except Exception as exc:
+        logger.exception("Retrain task %s failed", task_id)
+        _update(task_id, status="failed", finishedAt=_now(), error=str(exc))
+        return False
+    _update(task_id, status="succeeded", finishedAt=_now(), metrics=metrics)
+    logger.info("Retrain task %s finished → MAE=%.3f  R²=%.3f", task_id, metrics["mae"], metrics["r2"])
+    return True
+
+
+def _run() -> None:
+    # One training at a time across all workers. The lock holder also runs
+    # tasks queued meanwhile elsewhere, then publishes once — so a worker
+    # rotated out by that publish never strands a queued task.
+    trained = False
+    with _flock(RETRAIN_LOCK_PATH):
+        while (task_id := _claim_queued()) is not None:
+            trained |= _train(task_id)
+    if trained:
+        _publish_model()
+
+
+def submit_retrain() -> dict:
+    """Queue a retrain; a request arriving while one is still queued joins it."""
+    with _store() as tasks:
+        for task in reversed(tasks.values()):
+            if task["status"] == "queued":
+                return _public(task)
+
+        task_id = uuid.uuid4().hex
+        task = {"taskId": task_id, "status": "queued", "submittedAt": _now(),
+                "owner": _process_id(os.getpid())}
+        tasks[task_id] = task
+        while len(tasks) > RETRAIN_TASK_HISTORY:
+            del tasks[next(iter(tasks))]
+
+    _executor.submit(_run)
+    logger.info("Retrain task %s queued", task_id)
+    return _public(task)
+
+
+def get_task(task_id: str) -> dict | None:
+    """Return a copy of the task record, or None if unknown / expired."""
+    with _store() as tasks:
+        task = tasks.get(task_id)
+        return _public(task) if task is not None else None
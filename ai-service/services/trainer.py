@@ -14,11 +14,12 @@ import os
 import json
 import logging
 import datetime
-from collections import defaultdict
-
+import time
+import uuid
 import numpy as np
+import orjson
 import pandas as pd
-import joblib
+from numpy.lib.stride_tricks import sliding_window_view
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
@@ -26,6 +27,10 @@ from sklearn.metrics import mean_absolute_error, r2_score
 from config import (
     MODEL_DIR,
     MODEL_PATH,
+    MODEL_META_PATH,
+    MODEL_LIB_PATH,
+    COMPILE_MODEL,
+    XGB_DEVICE,
     XGB_PARAMS,
     SYNTHETIC_SAMPLES,
     SYNTHETIC_HISTORY_LEN,
@@ -33,7 +38,7 @@ from config import (
     MIN_HISTORY_LEN,
 )
 from utils.synthetic_data import generate_dataset
-from utils.feature_engineering import extract_features
+from utils.feature_engineering import FEATURE_NAMES, extract_feature_matrix
 
 logger = logging.getLogger(__name__)
 
@@ -42,28 +47,28 @@ logger = logging.getLogger(__name__)
 # Historical-data loader
 # ─────────────────────────────────────────────────────────────────
 
-def _load_historical_json(path: str) -> list[dict] | None:
+def _load_historical_json(path: str) -> pd.DataFrame | None:
     """
     Load the JSON export produced by the Node.js seeder.
 
-    Returns a list of dicts: { date, quantitySold, city, productId, ... }
+    Returns a DataFrame with columns: date, quantitySold, city, productId
     or None if the file doesn't exist / is empty.
     """
     if not os.path.exists(path):
         logger.info("No historical JSON at %s — falling back to synthetic data", path)
         return None
 
-    with open(path, "r") as f:
-        rows = json.load(f)
+    with open(path, "rb") as f:
+        rows = orjson.loads(f.read())
 
     if not rows:
         return None
 
     logger.info("Loaded %d rows from %s", len(rows), path)
-    return rows
+    return pd.DataFrame.from_records(rows, columns=["date", "quantitySold", "city", "productId"])
 
 
-def _build_sliding_windows(rows: list[dict], window_size: int = 30) -> pd.DataFrame:
+def _build_sliding_windows(df: pd.DataFrame, window_size: int = 30) -> dict[str, np.ndarray]:
     """
     Convert flat daily rows into sliding-window training samples.
 
@@ -71,72 +76,156 @@ def _build_sliding_windows(rows: list[dict], window_size: int = 30) -> pd.DataFr
     of `window_size` days across the series. The label is the *next day*
     after the window.
 
-    Returns DataFrame with columns:
-        salesHistory, currentStock, leadTimeDays, nextDayDemand, city, ref_date
+    Returns column arrays (one entry per sample):
+        salesHistory (N, window_size), currentStock, leadTimeDays,
+        nextDayDemand, city, ref_date
     """
-    # Group by product × city
-    groups: dict[str, list] = defaultdict(list)
-    for r in rows:
-        key = f"{r['productId']}|{r['city']}"
-        groups[key].append(r)
+    # Lay the product × city series out back to back (first-seen order),
+    # each sorted by date
+    series = df.groupby(["productId", "city"], sort=False, dropna=False).ngroup()
+    df = df.assign(_series=series).sort_values(["_series", "date"], kind="stable")
+
+    sales = df["quantitySold"].to_numpy(dtype=np.float32)
+    series = df["_series"].to_numpy()
+
+    # A window starting at i is valid when its label day i + window_size
+    # still belongs to the same series (short series yield none)
+    if len(sales) > window_size:
+        starts = np.flatnonzero(series[:-window_size] == series[window_size:])
+        history = sliding_window_view(sales, window_size)[starts]
+    else:
+        starts = np.empty(0, dtype=np.intp)
+        history = np.empty((0, window_size), dtype=np.float32)
+    label_idx = starts + window_size
+
+    next_day = sales[label_idx].astype(float)
+    city = df["city"].to_numpy(dtype=object)[label_idx]
+    ref_date = df["date"].to_numpy(dtype=object)[label_idx]
 
-    samples = []
     rng = np.random.default_rng(42)
+    stock_cap = np.maximum(1, (history.mean(axis=1) * 15).astype(np.int64))
+
+    logger.info("Built %d sliding-window samples from historical data", len(next_day))
+    return {
+        "salesHistory": history,
+        "currentStock": rng.integers(0, stock_cap),
+        "leadTimeDays": rng.integers(1, 22, size=len(next_day)),
+        "nextDayDemand": next_day,
+        "city": city,
+        "ref_date": ref_date,
+    }
+
+
+def _concat_samples(*parts: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Concatenate sample columns; histories of different widths become a ragged list."""
+    out: dict = {}
+    for key in parts[0]:
+        cols = [p[key] for p in parts]
+        if key == "salesHistory" and len({c.shape[1] for c in cols}) > 1:
+            out[key] = [row for c in cols for row in c]
+        else:
+            out[key] = np.concatenate(cols)
+    return out
 
-    for key, series in groups.items():
-        series.sort(key=lambda r: r["date"])
-        sales = [r["quantitySold"] for r in series]
-        dates = [r["date"] for r in series]
-        city = series[0]["city"]
 
-        if len(sales) < window_size + 1:
-            continue  # not enough data
+# ─────────────────────────────────────────────────────────────────
+# Feature-matrix builder
+# ─────────────────────────────────────────────────────────────────
 
-        for i in range(len(sales) - window_size):
-            window = sales[i : i + window_size]
-            next_day = float(sales[i + window_size])
-            ref = dates[i + window_size]  # label date
+def _build_Xy(samples: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """Convert sample columns into (X, y, feature_names)."""
+    # XGBoost works in float32 internally — build X that way from the start
+    X = np.empty((len(samples["nextDayDemand"]), len(FEATURE_NAMES)), dtype=np.float32)
+    extract_feature_matrix(
+        samples["salesHistory"],
+        samples["currentStock"],
+        samples["leadTimeDays"],
+        cities=samples.get("city"),
+        ref_dates=samples.get("ref_date"),
+        out=X,
+    )
+    y = np.asarray(samples["nextDayDemand"], dtype=float)
+    return X, y, list(FEATURE_NAMES)
 
-            samples.append({
-                "salesHistory": window,
-                "currentStock": int(rng.integers(0, max(1, int(np.mean(window) * 15)))),
-                "leadTimeDays": int(rng.integers(1, 22)),
-                "nextDayDemand": next_day,
-                "city": city,
-                "ref_date": ref,
-            })
 
-    logger.info("Built %d sliding-window samples from historical data", len(samples))
-    return pd.DataFrame(samples)
+def _replace_atomically(path: str, write) -> None:
+    """
+    Call `write(tmp_path)` on a temp path next to `path`, then rename it
+    over `path` — readers (reloading workers) never see a partial file.
+    The writer creates the file itself, so it gets the usual umask mode
+    (mkstemp's 0600 would lock out a service running as another user).
+    """
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp{ext}"   # keeps the suffix
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
-# ─────────────────────────────────────────────────────────────────
-# Feature-matrix builder
-# ─────────────────────────────────────────────────────────────────
+def _write_json(path: str, obj) -> None:
+    with open(path, "w") as f:
+        json.dump(obj, f)
 
-def _build_Xy(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, list[str]]:
-    """Convert DataFrame into (X, y, feature_names)."""
-    feature_dicts: list[dict] = []
-    for _, row in df.iterrows():
-        fd = extract_features(
-            row["salesHistory"],
-            row["currentStock"],
-            row["leadTimeDays"],
-            city=row.get("city"),
-            ref_date=row.get("ref_date"),
-        )
-        feature_dicts.append(fd)
-
-    feature_names = sorted(feature_dicts[0].keys())
-    X = np.array([[fd[k] for k in feature_names] for fd in feature_dicts])
-    y = df["nextDayDemand"].values.astype(float)
-    return X, y, feature_names
+
+def _compile_model(booster) -> bool:
+    """
+    Compile the booster to a native shared library with Treelite/TL2cgen
+    so the predictor can skip the XGBoost runtime. Optional — returns
+    False (and the predictor keeps using the booster) when the toolchain
+    is not installed, compilation fails or COMPILE_MODEL is off.
+    """
+    if not COMPILE_MODEL:
+        logger.info("COMPILE_MODEL is off — skipping model compilation")
+        return False
+    try:
+        import treelite
+        import tl2cgen
+    except ImportError:
+        logger.info("treelite / tl2cgen not installed — skipping model compilation")
+        return False
+
+    # Build next to the target, then swap in atomically for running workers
+    start = time.perf_counter()
+    try:
+        tl_model = treelite.frontend.from_xgboost(booster)
+        _replace_atomically(MODEL_LIB_PATH, lambda p: tl2cgen.export_lib(
+            tl_model,
+            toolchain="gcc",
+            libpath=p,
+            params={"parallel_comp": os.cpu_count() or 1},
+        ))
+    except Exception:
+        logger.exception("Model compilation failed — serving with the XGBoost booster")
+        return False
+
+    # Usually far longer than the boosting itself — see COMPILE_MODEL
+    logger.info("Compiled model saved → %s (%.1fs)", MODEL_LIB_PATH, time.perf_counter() - start)
+    return True
 
 
 # ─────────────────────────────────────────────────────────────────
 # Training pipeline
 # ─────────────────────────────────────────────────────────────────
 
+def _training_device() -> str:
+    """
+    XGB_DEVICE if set, else "cuda" when CuPy sees a GPU. Resolved per
+    training run, never at import: probing initialises the CUDA driver,
+    which must not happen in the gunicorn master before it forks.
+    """
+    if XGB_DEVICE:
+        return XGB_DEVICE
+    try:
+        import cupy
+        return "cuda" if cupy.cuda.runtime.getDeviceCount() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+
 def train_model(
     n_samples: int = SYNTHETIC_SAMPLES,
     history_len: int = SYNTHETIC_HISTORY_LEN,
@@ -156,33 +245,42 @@ def train_model(
     data_source = "historical"
 
     if historical is not None and len(historical) >= 500:
-        df = _build_sliding_windows(historical, window_size=30)
-        if len(df) < 200:
+        samples = _build_sliding_windows(historical, window_size=30)
+        n_hist = len(samples["nextDayDemand"])
+        if n_hist < 200:
             logger.warning(
                 "Only %d samples from historical data — supplementing with synthetic",
-                len(df),
+                n_hist,
             )
-            synth = generate_dataset(n_samples, history_len, seed)
-            df = pd.concat([df, synth], ignore_index=True)
+            synth = generate_dataset(n_samples, history_len, seed).columns()
+            samples = _concat_samples(samples, synth)
             data_source = "historical+synthetic"
     else:
         logger.info("Generating %d synthetic samples …", n_samples)
-        df = generate_dataset(n_samples, history_len, seed)
+        samples = generate_dataset(n_samples, history_len, seed).columns()
         data_source = "synthetic"
 
-    logger.info("Training data: %d samples (source: %s)", len(df), data_source)
+    logger.info(
+        "Training data: %d samples (source: %s)", len(samples["nextDayDemand"]), data_source
+    )
 
     # 2. Engineer features
     logger.info("Engineering features …")
-    X, y, feature_names = _build_Xy(df)
+    X, y, feature_names = _build_Xy(samples)
 
     # 3. Train / evaluate
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=seed
     )
 
-    logger.info("Training XGBRegressor (n=%d features) …", X.shape[1])
-    model = XGBRegressor(**XGB_PARAMS)
+    device = _training_device()
+    if device.startswith("cuda"):
+        # Hand XGBoost device arrays so boosting rounds skip the host → GPU copy
+        import cupy
+        X_train, X_test = cupy.asarray(X_train), cupy.asarray(X_test)
+
+    logger.info("Training XGBRegressor (n=%d features, device=%s) …", X.shape[1], device)
+    model = XGBRegressor(**XGB_PARAMS, device=device)
     model.fit(
         X_train,
         y_train,
@@ -197,9 +295,14 @@ def train_model(
 
     # 4. Persist
     os.makedirs(MODEL_DIR, exist_ok=True)
-    artifact = {"model": model, "feature_names": feature_names}
-    joblib.dump(artifact, MODEL_PATH)
+    if os.path.exists(MODEL_LIB_PATH):
+        os.remove(MODEL_LIB_PATH)   # never pair a stale compiled model with the new booster
+    booster = model.get_booster()
+    booster.set_param({"device": "cpu"})   # the API serves predictions on CPU
+    _replace_atomically(MODEL_PATH, booster.save_model)   # suffix keeps the UBJ format
+    _replace_atomically(MODEL_META_PATH, lambda p: _write_json(p, {"feature_names": feature_names}))
     logger.info("Model saved → %s", MODEL_PATH)
+    _compile_model(booster)
 
     return {"mae": mae, "r2": r2, "model_path": MODEL_PATH, "data_source": data_source}
 
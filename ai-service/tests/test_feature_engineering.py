@@ -0,0 +1,82 @@
+"""
+Regression checks for the Numba feature kernels against the original
+NumPy implementation — in particular for histories containing NaN
+(a JSON null in salesHistory / quantitySold).
+
+    cd ai-service && python -m unittest discover tests
+"""
+
+import unittest
+
+import numpy as np
+
+from config import ROLLING_WINDOWS, MIN_HISTORY_LEN
+from utils.feature_engineering import extract_features, extract_features_batch
+
+# Calendar features depend on the fallback heuristics, not on the history
+_SKIP = {"day_of_week", "month", "week_of_year"}
+
+
+def _reference(sales_history, current_stock, lead_time_days) -> dict[str, float]:
+    """The pre-Numba `extract_features` history / inventory statistics."""
+    arr = np.array(sales_history, dtype=float)
+    if len(arr) < MIN_HISTORY_LEN:
+        pad_val = arr.mean() if len(arr) > 0 else 0.0
+        arr = np.pad(arr, (MIN_HISTORY_LEN - len(arr), 0), constant_values=pad_val)
+
+    f: dict[str, float] = {}
+    for w in ROLLING_WINDOWS:
+        f[f"rolling_mean_{w}"] = float(np.mean(arr[-w:]))
+        f[f"rolling_std_{w}"] = float(np.std(arr[-w:], ddof=0))
+    f["rolling_mean_30"] = float(np.mean(arr[-30:]))
+    f["lag_7"] = float(arr[-7]) if len(arr) >= 7 else float(arr[0])
+    f["lag_30"] = float(arr[-30]) if len(arr) >= 30 else float(arr[0])
+    w0 = ROLLING_WINDOWS[0]
+    f["trend"] = float(np.mean(arr[-w0:]) - np.mean(arr[:w0]))
+    f["last_day_sales"] = float(arr[-1])
+    f["current_stock"] = float(current_stock)
+    f["lead_time_days"] = float(lead_time_days)
+    mean_7 = f["rolling_mean_7"]
+    f["stock_demand_ratio"] = float(current_stock / mean_7) if mean_7 > 0 else 999.0
+    return f
+
+
+class NaNHistoryTest(unittest.TestCase):
+    def assertFeaturesMatch(self, expected: dict, actual: dict, msg: str) -> None:
+        for name, want in expected.items():
+            got = actual[name]
+            if np.isnan(want):
+                self.assertTrue(np.isnan(got), f"{msg}: {name} = {got}, expected NaN")
+            else:
+                self.assertAlmostEqual(got, want, delta=1e-4 * max(1.0, abs(want)),
+                                       msg=f"{msg}: {name}")
+
+    def test_null_at_every_position(self):
+        rng = np.random.default_rng(0)
+        for length in (1, 5, 13, 14, 15, 20, 30, 31, 45, 60):
+            for pos in range(length):
+                history = rng.integers(5, 30, length).astype(float).tolist()
+                history[pos] = None
+                msg = f"len={length} null@{pos}"
+                expected = _reference(history, 50, 3)
+
+                single = extract_features(history, 50, 3)
+                self.assertFeaturesMatch(expected, single, msg + " (single)")
+
+                X, names = extract_features_batch(
+                    [{"salesHistory": history, "currentStock": 50, "leadTimeDays": 3}]
+                )
+                batch = {n: float(v) for n, v in zip(names, X[0]) if n not in _SKIP}
+                self.assertFeaturesMatch(expected, batch, msg + " (batch)")
+
+    def test_null_outside_windows_keeps_recent_stats(self):
+        history = [20.0 + i % 3 for i in range(31)]
+        history[0] = None
+        features = extract_features(history, 100, 5)
+        for name in ("rolling_mean_7", "rolling_std_7", "rolling_mean_14", "rolling_std_14"):
+            self.assertFalse(np.isnan(features[name]), name)
+        self.assertLess(features["stock_demand_ratio"], 999.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Numba kernels behind utils.feature_engineering.
+
+  history_kernel()  – rolling / lag / trend statistics for an (N, L)
+                      history matrix, rows spread over every core
+  row_kernel()      – the full feature vector for one history, serial
+                      (inference: no thread-pool hand-off per request)
+
+Both share `_row_stats`, so batch and single-row features are computed
+by the same code. Everything is compiled with `cache=True`; call
+`feature_engineering.warm_up()` at startup to load the machine code
+before the first request. No `fastmath`: a null in salesHistory arrives
+as NaN and must take the same branches as NumPy's batch path.
+"""
+
+import os
+import math
+
+import numba
+import numpy as np
+from numba import njit, prange
+
+# The kernels run on request / retrain threads; TBB's pool can then hang
+# interpreter shutdown, so prefer OpenMP unless explicitly configured.
+if "NUMBA_THREADING_LAYER" not in os.environ:
+    numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+
+
+@njit(cache=True, nogil=True)
+def _tail_value(row, n, m, p, k):
+    """
+    Value `k` days back in the virtual series — the `n` real values at
+    the end of `row` left-padded with `p` up to length `m` — clamped to
+    its oldest day.
+    """
+    k = min(k, m)
+    if k <= n:
+        return row[row.shape[0] - k]
+    return p
+
+
+@njit(cache=True, nogil=True)
+def _row_stats(row, n, windows, min_len, out):
+    """
+    Fill `out` with the history statistics of `row` (right-aligned, `n`
+    valid values), in `_HISTORY_COLS` order.
+
+    Rows shorter than `min_len` behave as if left-padded with their own
+    mean; the padding is folded into the window sums, never materialised.
+    """
+    L = row.shape[0]
+    nw = windows.shape[0]
+    base = 2 * nw
+    m = max(n, min_len)
+
+    # Trend's first window: `pad` virtual days then the oldest `r` real ones
+    w0 = min(windows[0], m)
+    pad0 = min(w0, m - n)
+    k_head = n - (w0 - pad0)       # suffix length before reaching them
+
+    # One backward pass: suffix sum / sum-of-squares captured at
+    # every window edge (stored in `out` until finalised below). The
+    # head is summed on its own so a NaN day only poisons the windows
+    # that contain it, as with NumPy.
+    for j in range(nw):
+        out[2 * j] = 0.0
+        out[2 * j + 1] = 0.0
+    s = 0.0
+    s2 = 0.0
+    s30 = 0.0
+    s_head = 0.0
+    for k in range(1, n + 1):
+        v = row[L - k]
+        s += v
+        s2 += v * v
+        for j in range(nw):
+            if k == min(windows[j], n):
+                out[2 * j] = s
+                out[2 * j + 1] = s2
+        if k == min(30, n):
+            s30 = s
+        if k > k_head:
+            s_head += v
+    # Pad value: mean of the real history, only needed for short rows
+    # (pad terms are added only when there is padding — 0 · NaN is NaN)
+    p = s / n if 0 < n < min_len else 0.0
+
+    # Rolling mean / std: E[x], sqrt(E[x²] − E[x]²)
+    for j in range(nw):
+        w = min(windows[j], m)
+        pad = w - min(w, n)
+        sw = out[2 * j]
+        sw2 = out[2 * j + 1]
+        if pad > 0:
+            sw += pad * p
+            sw2 += pad * p * p
+        mean = sw / w
+        var = sw2 / w - mean * mean
+        out[2 * j] = mean
+        out[2 * j + 1] = 0.0 if var < 0.0 else math.sqrt(var)   # rounding; NaN stays NaN
+
+    # 30-day mean
+    w = min(30, m)
+    pad = w - min(w, n)
+    out[base] = (s30 + pad * p if pad > 0 else s30) / w
+
+    # Lags
+    out[base + 1] = _tail_value(row, n, m, p, 7)
+    out[base + 2] = _tail_value(row, n, m, p, 30)
+
+    # Trend: mean of last window (== rolling mean 0) minus first window
+    head = s_head + pad0 * p if pad0 > 0 else s_head
+    out[base + 3] = out[0] - head / w0
+
+    out[base + 4] = _tail_value(row, n, m, p, 1)
+
+
+@njit(cache=True, nogil=True, parallel=True)
+def history_kernel(S, lens, windows, min_len, out):
+    """`_row_stats` for every row `i` of `S` (`lens[i]` valid values) into `out[i]`."""
+    for i in prange(S.shape[0]):
+        _row_stats(S[i], lens[i], windows, min_len, out[i])
+
+
+@njit(cache=True, nogil=True)
+def row_kernel(row, windows, min_len, hist_idx, mean_pos, cols, dow, month, week, city, stock, lead, out):
+    """
+    Write one product's complete feature vector into `out`.
+
+    History statistics land at `out[hist_idx]`; `cols` holds the output
+    columns of day_of_week, month, week_of_year, city_encoded,
+    current_stock, lead_time_days and stock_demand_ratio, in that order.
+    `mean_pos` is rolling_mean_7's position among the statistics.
+    """
+    hist = np.empty(hist_idx.shape[0])
+    _row_stats(row, row.shape[0], windows, min_len, hist)
+    for c in range(hist_idx.shape[0]):
+        out[hist_idx[c]] = hist[c]
+
+    out[cols[0]] = dow
+    out[cols[1]] = month
+    out[cols[2]] = week
+    out[cols[3]] = city
+    out[cols[4]] = stock
+    out[cols[5]] = lead
+    mean_7 = hist[mean_pos]
+    out[cols[6]] = stock / mean_7 if mean_7 > 0 else 999.0
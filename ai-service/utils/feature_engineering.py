@@ -4,9 +4,17 @@ Feature engineering for the demand forecasting model.
 
 Converts raw daily sales history into a flat feature vector for XGBoost.
 
-Two entry-points:
-  extract_features()         – for a single product (inference + synthetic training)
-  extract_features_batch()   – for bulk rows
+Entry-points:
+  extract_features()         – for a single product, as a named dict
+  extract_features_vec()     – for a single product, into a caller buffer (inference)
+  extract_features_batch()   – for bulk rows, as a float32 matrix + names
+  extract_feature_matrix()   – (N, F) matrix in FEATURE_NAMES order (training)
+
+All rolling / lag / trend statistics come from the Numba kernels in
+`utils._features_numba`: batches walk an (N, L) history matrix, spreading
+rows over every core with `prange` and releasing the GIL while they run;
+single-row inference uses a serial kernel that writes the whole feature
+vector in one call. The dict-returning helpers are thin wrappers.
 
 Features produced
 ─────────────────
@@ -28,8 +36,14 @@ Features produced
   stock_demand_ratio  – currentStock / rolling_mean_7
 """
 
+import datetime
+from functools import lru_cache
+
 import numpy as np
+import pandas as pd
+
 from config import ROLLING_WINDOWS, MIN_HISTORY_LEN
+from utils._features_numba import history_kernel, row_kernel
 
 # ── City encoder (alphabetical → deterministic) ─────────────────
 CITY_MAP = {
@@ -41,13 +55,217 @@ CITY_MAP = {
 }
 CITY_DEFAULT = -1  # unknown city
 
+# ── Feature schema (column order of every feature matrix) ───────
+FEATURE_NAMES: tuple[str, ...] = tuple(sorted(
+    [f"rolling_mean_{w}" for w in ROLLING_WINDOWS]
+    + [f"rolling_std_{w}" for w in ROLLING_WINDOWS]
+    + [
+        "rolling_mean_30", "lag_7", "lag_30", "trend", "last_day_sales",
+        "day_of_week", "month", "week_of_year", "city_encoded",
+        "current_stock", "lead_time_days", "stock_demand_ratio",
+    ]
+))
+_COL = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+# Column order written by the history kernels
+_HISTORY_COLS: tuple[str, ...] = tuple(
+    [name for w in ROLLING_WINDOWS for name in (f"rolling_mean_{w}", f"rolling_std_{w}")]
+    + ["rolling_mean_30", "lag_7", "lag_30", "trend", "last_day_sales"]
+)
+_HISTORY_IDX = np.array([_COL[name] for name in _HISTORY_COLS], dtype=np.int64)
+_HIST_MEAN_7 = _HISTORY_COLS.index("rolling_mean_7")
+_WINDOWS = np.array(ROLLING_WINDOWS, dtype=np.int64)
 
+# Resolved once so the per-call path does no name → index lookups
+_N_FEATURES = len(FEATURE_NAMES)
+_N_HISTORY = len(_HISTORY_COLS)
+_DOW, _MONTH, _WEEK, _CITY, _STOCK, _LEAD, _RATIO = (
+    _COL[name]
+    for name in (
+        "day_of_week", "month", "week_of_year", "city_encoded",
+        "current_stock", "lead_time_days", "stock_demand_ratio",
+    )
+)
+_SCALAR_COLS = np.array([_DOW, _MONTH, _WEEK, _CITY, _STOCK, _LEAD, _RATIO], dtype=np.int64)
+
+
+@lru_cache(maxsize=256)   # a handful of distinct spellings in practice
 def _encode_city(city: str | None) -> float:
     if city is None:
         return float(CITY_DEFAULT)
     return float(CITY_MAP.get(city.strip().lower(), CITY_DEFAULT))
 
 
+def _encode_cities(cities) -> np.ndarray:
+    """
+    Vectorised `_encode_city`: factorise to integer codes once, encode
+    each distinct city name, then gather per row.
+    """
+    if len(cities) == 1:   # single-row inference: skip the factorise
+        return np.array([_encode_city(cities[0])])
+    codes, uniques = pd.factorize(np.asarray(cities, dtype=object))
+    lut = np.array([_encode_city(c) for c in uniques] + [float(CITY_DEFAULT)])
+    return lut[codes]      # code -1 (missing) hits the trailing default
+
+
+def _stack_histories(histories) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Right-align variable-length histories into one (N, L) float matrix
+    (NaN to the left of each row). Returns (S, lens) with the real length
+    of every row; short-history padding is handled by the kernel.
+    """
+    if isinstance(histories, np.ndarray) and histories.ndim == 2:
+        # Already a uniform matrix — nothing to align. Narrow storage
+        # (int16 counts, float32) is kept: the kernel accumulates in float64
+        dtype = histories.dtype if histories.dtype.kind in "iuf" else float
+        return np.ascontiguousarray(histories, dtype=dtype), np.full(len(histories), histories.shape[1])
+
+    lens = np.fromiter((len(h) for h in histories), dtype=np.int64, count=len(histories))
+    L = max(1, int(lens.max(initial=0)))
+    if len(lens) and lens.min() == L:
+        # Equal lengths (the usual batch) — one C-level copy, no alignment
+        return np.array(histories, dtype=float), lens
+
+    seqs = [np.asarray(h, dtype=float) for h in histories]
+    S = np.full((len(seqs), L), np.nan)
+    for i, s in enumerate(seqs):
+        if len(s):
+            S[i, L - len(s):] = s
+    return S, lens
+
+
+@lru_cache(maxsize=1024)   # inference asks for the same "today" all day
+def _calendar(d) -> tuple[int, int, int]:
+    """(day_of_week, month, week_of_year) of an ISO string or date."""
+    dt = datetime.date.fromisoformat(d) if isinstance(d, str) else d
+    return dt.weekday(), dt.month, dt.isocalendar()[1]
+
+
+def _calendar_columns(ref_dates, fallback_dow: np.ndarray) -> tuple[np.ndarray, ...]:
+    """day_of_week / month / week_of_year, computed on datetime64 days."""
+    n = len(fallback_dow)
+    dow = fallback_dow.astype(float)
+    month = np.ones(n)
+    week = np.ones(n)
+    if ref_dates is None:
+        return dow, month, week
+
+    refs = np.asarray(ref_dates, dtype=object)
+    has = np.not_equal(refs, None)
+    try:
+        days = refs[has].astype("datetime64[D]")   # ISO strings / dates, parsed in C
+    except (ValueError, TypeError):
+        # Something NumPy can't parse — per distinct value, as `_calendar` sees it
+        cal = np.array([_calendar(d) for d in refs[has]], dtype=float).reshape(-1, 3)
+        dow[has], month[has], week[has] = cal.T
+        return dow, month, week
+
+    wd = (days.astype(np.int64) + 3) % 7                  # 0=Mon (1970-01-01 was a Thursday)
+    thursday = days - wd + 3                              # ISO weeks belong to their Thursday's year
+    jan_1 = thursday.astype("datetime64[Y]").astype("datetime64[D]")
+    dow[has] = wd
+    month[has] = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    week[has] = (thursday - jan_1).astype(np.int64) // 7 + 1
+    return dow, month, week
+
+
+def extract_feature_matrix(
+    histories,
+    current_stock,
+    lead_time_days,
+    cities=None,
+    ref_dates=None,
+    day_offsets=None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Build the (N, F) feature matrix for N samples, columns in
+    FEATURE_NAMES order.
+
+    Parameters
+    ----------
+    histories : (N, L) array or sequence of sequences
+        Daily sales per sample (oldest → newest); lengths may differ.
+    current_stock, lead_time_days : array-like of length N
+    cities : sequence of str | None, optional
+    ref_dates : sequence of date-like | None, optional
+    day_offsets : array-like of int, optional
+        Simulated day-of-week offsets used when a ref_date is missing.
+    out : (N, F) array, optional
+        Destination buffer; allocated (float64) when omitted. Pass a
+        float32 buffer to get model-ready features — statistics are still
+        computed in float64 and only rounded on store.
+    """
+    S, lens = _stack_histories(histories)
+    n = S.shape[0]
+    X = np.empty((n, _N_FEATURES)) if out is None else out
+
+    # ── Rolling / lag / trend statistics ─────────────────────────
+    hist = np.empty((n, _N_HISTORY))
+    history_kernel(S, lens, _WINDOWS, MIN_HISTORY_LEN, hist)
+    X[:, _HISTORY_IDX] = hist
+
+    # ── Calendar features ────────────────────────────────────────
+    offsets = np.maximum(lens, MIN_HISTORY_LEN)      # length after padding
+    if day_offsets is not None:
+        offsets = offsets + np.asarray(day_offsets)
+    dow, month, week = _calendar_columns(ref_dates, offsets % 7)
+    X[:, _DOW] = dow
+    X[:, _MONTH] = month
+    X[:, _WEEK] = week
+
+    # ── City encoding ────────────────────────────────────────────
+    if cities is None:
+        X[:, _CITY] = CITY_DEFAULT
+    else:
+        X[:, _CITY] = _encode_cities(cities)
+
+    # ── Inventory / demand indicators ────────────────────────────
+    stock = np.asarray(current_stock, dtype=float)
+    X[:, _STOCK] = stock
+    X[:, _LEAD] = lead_time_days
+
+    mean_7 = hist[:, _HIST_MEAN_7]   # full precision, whatever X's dtype
+    X[:, _RATIO] = np.divide(
+        stock, mean_7, out=np.full(n, 999.0), where=mean_7 > 0
+    )
+
+    return X
+
+
+def extract_features_vec(
+    sales_history: list[int | float],
+    current_stock: int | float,
+    lead_time_days: int | float,
+    out: np.ndarray,
+    day_offset: int = 0,
+    city: str | None = None,
+    ref_date=None,
+) -> np.ndarray:
+    """
+    Write one product's features into `out` (length F, FEATURE_NAMES
+    order) and return it — the dict-free path used for inference.
+    Same values as a row of `extract_feature_matrix`, via the serial kernel.
+    """
+    if isinstance(sales_history, np.ndarray):
+        row = np.asarray(sales_history, dtype=float)    # no copy for float64 input
+    else:
+        # Lists (JSON payloads): one pass, exact-size allocation; nested
+        # input fails here with a ValueError rather than inside the kernel
+        row = np.fromiter(sales_history, dtype=float, count=len(sales_history))
+    if ref_date is None:
+        dow, month, week = (max(len(row), MIN_HISTORY_LEN) + day_offset) % 7, 1, 1
+    else:
+        dow, month, week = _calendar(ref_date)
+
+    row_kernel(
+        row, _WINDOWS, MIN_HISTORY_LEN, _HISTORY_IDX, _HIST_MEAN_7, _SCALAR_COLS,
+        float(dow), float(month), float(week), _encode_city(city),
+        float(current_stock), float(lead_time_days), out,
+    )
+    return out
+
+
 def extract_features(
     sales_history: list[int | float],
     current_stock: int | float,
@@ -73,83 +291,49 @@ def extract_features(
         Reference date for month / week_of_year. Falls back to
         array-length heuristic when missing.
     """
-    arr = np.array(sales_history, dtype=float)
-
-    # Pad if too short
-    if len(arr) < MIN_HISTORY_LEN:
-        pad_val = arr.mean() if len(arr) > 0 else 0.0
-        arr = np.pad(arr, (MIN_HISTORY_LEN - len(arr), 0), constant_values=pad_val)
-
-    features: dict[str, float] = {}
-
-    # ── Rolling statistics ───────────────────────────────────────
-    for w in ROLLING_WINDOWS:
-        window = arr[-w:]
-        features[f"rolling_mean_{w}"] = float(np.mean(window))
-        features[f"rolling_std_{w}"] = float(np.std(window, ddof=0))
-
-    # 30-day rolling mean
-    w30 = arr[-30:] if len(arr) >= 30 else arr
-    features["rolling_mean_30"] = float(np.mean(w30))
-
-    # ── Lag features ─────────────────────────────────────────────
-    features["lag_7"] = float(arr[-7]) if len(arr) >= 7 else float(arr[0])
-    features["lag_30"] = float(arr[-30]) if len(arr) >= 30 else float(arr[0])
-
-    # ── Trend ────────────────────────────────────────────────────
-    first_window = arr[: ROLLING_WINDOWS[0]]
-    last_window = arr[-ROLLING_WINDOWS[0] :]
-    features["trend"] = float(np.mean(last_window) - np.mean(first_window))
-
-    # ── Last day sales ───────────────────────────────────────────
-    features["last_day_sales"] = float(arr[-1])
-
-    # ── Calendar features ────────────────────────────────────────
-    if ref_date is not None:
-        import datetime as _dt
-
-        if isinstance(ref_date, str):
-            ref_date = _dt.date.fromisoformat(ref_date)
-        features["day_of_week"] = float(ref_date.weekday())       # 0=Mon
-        features["month"] = float(ref_date.month)                 # 1-12
-        features["week_of_year"] = float(ref_date.isocalendar()[1])
-    else:
-        features["day_of_week"] = float((len(arr) + day_offset) % 7)
-        features["month"] = 1.0           # fallback
-        features["week_of_year"] = 1.0
+    x = extract_features_vec(
+        sales_history,
+        current_stock,
+        lead_time_days,
+        np.empty(_N_FEATURES),
+        day_offset=day_offset,
+        city=city,
+        ref_date=ref_date,
+    )
+    return dict(zip(FEATURE_NAMES, x.tolist()))
 
-    # ── City encoding ────────────────────────────────────────────
-    features["city_encoded"] = _encode_city(city)
 
-    # ── Inventory / demand indicators ────────────────────────────
-    features["current_stock"] = float(current_stock)
-    features["lead_time_days"] = float(lead_time_days)
+def extract_features_batch(rows: list[dict]) -> tuple[np.ndarray, list[str]]:
+    """
+    Vectorised helper — builds features for a list of dicts each
+    containing salesHistory, currentStock, leadTimeDays, and
+    optionally city / ref_date.
 
-    mean_7 = features["rolling_mean_7"]
-    features["stock_demand_ratio"] = (
-        float(current_stock / mean_7) if mean_7 > 0 else 999.0
+    Returns (X, feature_names): a float32 (N, F) matrix ready for
+    XGBoost, columns in FEATURE_NAMES order.
+    """
+    X = np.empty((len(rows), _N_FEATURES), dtype=np.float32)
+    extract_feature_matrix(
+        [r["salesHistory"] for r in rows],
+        [r["currentStock"] for r in rows],
+        [r["leadTimeDays"] for r in rows],
+        cities=[r.get("city") for r in rows],
+        ref_dates=[r.get("ref_date") for r in rows],
+        day_offsets=np.arange(len(rows)),
+        out=X,
     )
-
-    return features
+    return X, list(FEATURE_NAMES)
 
 
-def extract_features_batch(rows: list[dict]) -> list[dict[str, float]]:
+def warm_up() -> None:
     """
-    Vectorised helper — applies `extract_features` to a list of dicts
-    each containing salesHistory, currentStock, leadTimeDays, and
-    optionally city / ref_date.
+    Load (or compile) the single-row kernel before the first request.
+    Deliberately skips the parallel batch kernel so a pre-forking server
+    never starts its thread pool in the master process.
     """
-    return [
-        extract_features(
-            r["salesHistory"],
-            r["currentStock"],
-            r["leadTimeDays"],
-            day_offset=i,
-            city=r.get("city"),
-            ref_date=r.get("ref_date"),
-        )
-        for i, r in enumerate(rows)
-    ]
+    history = np.arange(MIN_HISTORY_LEN, dtype=float)
+    for dtype in (np.float64, np.float32):
+        extract_features_vec(history, 0, 1, np.empty(_N_FEATURES, dtype=dtype))
 
 
 # ── Quick CLI test ───────────────────────────────────────────────
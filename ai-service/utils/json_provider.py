@@ -0,0 +1,22 @@
+"""
+orjson-backed JSON provider for Flask.
+
+Used for every `jsonify` response and `request.get_json()` body; keys
+stay sorted like Flask's default provider, and NumPy scalars / arrays
+serialise natively.
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+_DUMPS_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Drop-in replacement for Flask's stdlib-json provider."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=_DUMPS_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
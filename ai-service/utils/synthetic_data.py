@@ -11,12 +11,22 @@ Produces realistic daily-sales time-series with:
   • Varying lead-times and current-stock levels
 
 Each sample is a window of N days, labelled with the *next-day* demand.
+`generate_dataset` returns the samples column-wise (`SyntheticDataset`);
+`.to_dataframe()` gives the row view for inspection.
 """
 
 import datetime
+from dataclasses import dataclass, fields
+
 import numpy as np
 import pandas as pd
-from config import SYNTHETIC_SAMPLES, SYNTHETIC_HISTORY_LEN
+from joblib import Parallel, delayed
+from config import (
+    SYNTHETIC_SAMPLES,
+    SYNTHETIC_HISTORY_LEN,
+    SYNTHETIC_CHUNK_SIZE,
+    SYNTHETIC_N_JOBS,
+)
 
 # ── Seasonality constants ────────────────────────────────────────
 
@@ -30,6 +40,8 @@ CITY_BIAS = {
     "chennai": 0.85,
 }
 
+_CITY_MULT = np.array([CITY_BIAS[c] for c in CITIES])   # aligned with CITIES
+
 # 0=Jan … 11=Dec
 MONTH_SEASONALITY = [
     0.70, 0.72, 0.85, 0.95, 1.15, 1.30,
@@ -39,6 +51,14 @@ MONTH_SEASONALITY = [
 WEEKDAY_FACTOR = [1.0, 1.05, 1.02, 0.98, 1.10, 0.80, 0.70]  # Mon-Sun
 
 
+def _calendar_factors(first: np.datetime64, n_days: int) -> tuple[np.ndarray, np.ndarray]:
+    """Month and weekday factors for `n_days` consecutive days from `first`."""
+    dates = first + np.arange(n_days)
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12      # 0-indexed
+    weekdays = (dates.astype(np.int64) + 3) % 7                       # 0=Mon (1970-01-01 was a Thursday)
+    return np.asarray(MONTH_SEASONALITY)[months], np.asarray(WEEKDAY_FACTOR)[weekdays]
+
+
 def generate_single_series(
     history_len: int = SYNTHETIC_HISTORY_LEN,
     base_demand: float | None = None,
@@ -76,25 +96,19 @@ def generate_single_series(
     start_offset = rng.integers(0, 365)
     start_date = today - datetime.timedelta(days=history_len + 1 + int(start_offset))
 
-    sales = []
-    dates = []
-    for day in range(history_len + 1):
-        d = start_date + datetime.timedelta(days=day)
-        month = d.month - 1               # 0-indexed
-        weekday = d.weekday()             # 0=Mon
-
-        seasonal = MONTH_SEASONALITY[month]
-        wk = WEEKDAY_FACTOR[weekday]
-        noise = rng.normal(0, base_demand * 0.15)
-        trend = trend_slope * day
+    # Whole series at once: calendar factors per day, one noise draw per day
+    days = np.arange(history_len + 1)
+    first = np.datetime64(start_date, "D")
+    seasonal, wk = _calendar_factors(first, history_len + 1)
+    noise = rng.normal(0, base_demand * 0.15, size=history_len + 1)
+    trend = trend_slope * days
 
-        daily = max(0, base_demand * seasonal * city_mult * wk + trend + noise)
-        sales.append(round(daily))
-        dates.append(d)
+    daily = np.maximum(0, base_demand * seasonal * city_mult * wk + trend + noise)
+    sales = np.rint(daily).astype(np.int16)   # daily counts stay in the low hundreds
 
-    history = sales[:-1]
+    history = sales[:-1].tolist()
     next_day = float(sales[-1])
-    ref_date = dates[-1].isoformat()
+    ref_date = str(first + history_len)
 
     current_stock = int(rng.integers(0, max(1, int(base_demand * 15))))
     lead_time = int(rng.integers(1, 22))
@@ -109,25 +123,106 @@ def generate_single_series(
     }
 
 
+@dataclass
+class SyntheticDataset:
+    """Synthetic samples as column arrays, one entry per sample."""
+    salesHistory: np.ndarray     # (N, H) int16
+    currentStock: np.ndarray     # (N,) int
+    leadTimeDays: np.ndarray     # (N,) int
+    nextDayDemand: np.ndarray    # (N,) float — label
+    city: np.ndarray             # (N,) str
+    ref_date: np.ndarray         # (N,) ISO date str of the label day
+
+    def __len__(self) -> int:
+        return len(self.nextDayDemand)
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """The arrays keyed by column name (no copies)."""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Row view for debugging — salesHistory becomes one array per row."""
+        cols = self.columns()
+        cols["salesHistory"] = list(self.salesHistory)
+        return pd.DataFrame(cols)
+
+
+def _generate_batch(n: int, history_len: int, rng: np.random.Generator) -> dict[str, np.ndarray]:
+    """
+    Draw `n` series at once as column arrays — the batched counterpart of
+    `generate_single_series`, with every per-day term an (n, history_len + 1)
+    matrix.
+    """
+    base_demand = rng.uniform(5, 80, size=n)
+    city_idx = rng.integers(0, len(CITIES), size=n)
+    city = np.asarray(CITIES, dtype=object)[city_idx]
+    city_mult = _CITY_MULT[city_idx]
+    trend_slope = rng.uniform(-0.3, 0.3, size=n)
+    start_offset = rng.integers(0, 365, size=n)
+
+    # Every series falls inside one span of history_len + 365 days, so
+    # evaluate the calendar once for that span and gather per sample
+    days = np.arange(history_len + 1)
+    first = np.datetime64(datetime.date.today(), "D") - (history_len + 365)
+    season_lut, wk_lut = _calendar_factors(first, history_len + 365)
+    idx = (364 - start_offset)[:, None] + days          # day index into the span
+
+    seasonal = season_lut[idx]
+    wk = wk_lut[idx]
+    noise = rng.standard_normal((n, history_len + 1)) * (base_demand * 0.15)[:, None]
+    trend = trend_slope[:, None] * days
+
+    level = (base_demand * city_mult)[:, None]
+    daily = np.maximum(0, level * seasonal * wk + trend + noise)
+    np.rint(daily, out=daily)                 # round in place, cast once below
+
+    return {
+        "salesHistory": daily[:, :-1].astype(np.int16),   # daily counts stay in the low hundreds
+        "currentStock": rng.integers(0, np.maximum(1, (base_demand * 15).astype(np.int64))),
+        "leadTimeDays": rng.integers(1, 22, size=n),
+        "nextDayDemand": daily[:, -1].copy(),
+        "city": city,
+        "ref_date": np.datetime_as_string(first + idx[:, -1]).astype(object),
+    }
+
+
 def generate_dataset(
     n_samples: int = SYNTHETIC_SAMPLES,
     history_len: int = SYNTHETIC_HISTORY_LEN,
     seed: int = 42,
-) -> pd.DataFrame:
+) -> SyntheticDataset:
     """
-    Build a DataFrame with `n_samples` synthetic rows ready for feature
-    engineering.
+    Build `n_samples` synthetic samples ready for feature engineering.
+
+    Samples are drawn in chunks of SYNTHETIC_CHUNK_SIZE on a thread pool
+    (NumPy releases the GIL for the bulk draws and arithmetic). Each
+    chunk has its own RNG stream spawned from `seed`, so the output
+    depends only on `seed`, not on the number of workers.
 
-    Columns: salesHistory, currentStock, leadTimeDays, nextDayDemand, city, ref_date
+    Columns: salesHistory (N, history_len), currentStock, leadTimeDays,
+             nextDayDemand, city, ref_date
     """
-    rng = np.random.default_rng(seed)
-    rows = [generate_single_series(history_len, rng=rng) for _ in range(n_samples)]
-    return pd.DataFrame(rows)
+    n_chunks, rest = divmod(n_samples, SYNTHETIC_CHUNK_SIZE)
+    sizes = [SYNTHETIC_CHUNK_SIZE] * n_chunks + ([rest] if rest or not n_chunks else [])
+    # SFC64: cheaper than the default PCG64 for bulk draws, same seeding API
+    rngs = [
+        np.random.Generator(np.random.SFC64(ss))
+        for ss in np.random.SeedSequence(seed).spawn(len(sizes))
+    ]
+
+    if len(sizes) == 1:
+        parts = [_generate_batch(sizes[0], history_len, rngs[0])]
+    else:
+        parts = Parallel(n_jobs=SYNTHETIC_N_JOBS, prefer="threads")(
+            delayed(_generate_batch)(size, history_len, rng) for size, rng in zip(sizes, rngs)
+        )
+
+    return SyntheticDataset(**{key: np.concatenate([p[key] for p in parts]) for key in parts[0]})
 
 
 # ── Quick CLI test ───────────────────────────────────────────────
 if __name__ == "__main__":
-    df = generate_dataset(10)
+    df = generate_dataset(10).to_dataframe()
     print(df[["city", "currentStock", "leadTimeDays", "nextDayDemand", "ref_date"]].head(10))
     print(f"\nShape: {df.shape}")
     print(f"Cities: {df['city'].value_counts().to_dict()}")
@@ -0,0 +1,20 @@
+"""
+Production WSGI entry-point — served by gunicorn (see gunicorn_conf.py).
+
+Initial training (when no model exists yet) runs in a spawned child so
+the preloading master never starts OpenMP thread pools (XGBoost, Numba)
+before it forks the workers.
+"""
+
+import os
+import multiprocessing
+
+from config import MODEL_PATH
+from app import create_app, ensure_model
+
+if not os.path.exists(MODEL_PATH):
+    _trainer = multiprocessing.get_context("spawn").Process(target=ensure_model)
+    _trainer.start()
+    _trainer.join()
+
+app = create_app()